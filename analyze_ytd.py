@@ -1,7 +1,19 @@
 import pandas as pd
-import json
+import numpy as np
 import os
-from collections import defaultdict
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from sleeper_cache import load_matchups_table, read_slim_players, slim_file_is_current
+
+try:
+    import orjson as _json
+except ImportError:  # orjson is optional; the standard library parser is slower but equivalent
+    import json as _json
+
+try:
+    import simdjson
+except ImportError:  # pysimdjson is optional; without it the player file is parsed in full
+    simdjson = None
 
 # ====================================================================
 # CONFIGURATION
@@ -9,20 +21,22 @@ from collections import defaultdict
 # ====================================================================
 YTD_DATA_DIR = "ytd_matchups_data"
 PLAYER_DATA_FILE = "sleeper_players.json" 
+PLAYER_SLIM_FILE = "players_slim.parquet" # Written by get_players.py; used instead of the JSON when up to date
 ROSTER_MAP_FILE = "roster_name_map.json"
 OUTPUT_FILE = "ytd_starter_analysis.csv"
 
 # Positions to track for YTD starters
 POSITIONS_OF_INTEREST = ['QB', 'RB', 'WR', 'TE']
+POSITION_INDEX = {position: i for i, position in enumerate(POSITIONS_OF_INTEREST)} # Column in the totals array
 
 # ====================================================================
 # DATA LOADING FUNCTIONS
 # ====================================================================
-def load_data(file_path, data_type):
+def load_data(file_path, data_type, parse=_json.loads):
     """Generic function to load a JSON file with error handling."""
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        with open(file_path, 'rb') as f:
+            return parse(f.read())
     except FileNotFoundError:
         print(f"❌ ERROR: {data_type} file not found at {file_path}. Please check the filename or run the corresponding data script.")
         return None
@@ -30,6 +44,44 @@ def load_data(file_path, data_type):
         print(f"❌ ERROR: Failed to load {data_type} data from {file_path}: {e}")
         return None
 
+def parse_player_positions(raw):
+    """Parses the Sleeper player file into a {player_id: position} map."""
+    if simdjson is None:
+        player_data = _json.loads(raw)
+    else:
+        # simdjson reads 'position' straight off its tape; the other fields are never turned into Python objects
+        parser = simdjson.Parser()
+        player_data = parser.parse(raw)
+    return {player_id: details.get('position') for player_id, details in player_data.items()}
+
+@functools.lru_cache(maxsize=64) # Bounded, so edited files don't pile up parsed copies in a long session
+def read_week_data(file_path, mtime_ns):
+    """
+    Reads and parses one weekly matchup file, memoized for repeat runs in the same session.
+    mtime_ns is only part of the cache key, so a file that changes on disk is read again.
+    Errors are raised rather than returned, so a failed load is never cached.
+    """
+    with open(file_path, 'rb') as f:
+        return _json.loads(f.read())
+
+def load_week_data(file_path, mtime_ns):
+    """Loads one weekly matchup file through the cache, or returns None if it can't be loaded."""
+    try:
+        return read_week_data(file_path, mtime_ns)
+    except Exception as e:
+        print(f"❌ ERROR: Failed to load Matchup data from {file_path}: {e}")
+        return None
+
+def load_player_positions():
+    """Returns {player_id: position}, read from the slim Parquet file when it is current."""
+    if slim_file_is_current(PLAYER_SLIM_FILE, PLAYER_DATA_FILE):
+        try:
+            return dict(read_slim_players(PLAYER_SLIM_FILE, ['pid', 'pos']))
+        except Exception as e:
+            print(f"     ⚠️ Could not read {PLAYER_SLIM_FILE} ({e}). Falling back to {PLAYER_DATA_FILE}.")
+
+    return load_data(PLAYER_DATA_FILE, "Player Map", parse=parse_player_positions)
+
 # ====================================================================
 # MAIN ANALYSIS FUNCTION
 # ====================================================================
@@ -37,63 +89,89 @@ def analyze_ytd_starters():
     """Aggregates starter scores by position for all teams YTD and saves to CSV."""
     
     # 1. Load Required Maps
-    player_map = load_data(PLAYER_DATA_FILE, "Player Map")
+    player_positions = load_player_positions()
     roster_name_map = load_data(ROSTER_MAP_FILE, "Roster Name Map")
-    if player_map is None or roster_name_map is None:
+    if player_positions is None or roster_name_map is None:
         return
 
-    # 2. Initialize the master tracking dictionary
-    # Structure: {roster_id: {'QB': 0, 'RB': 0, 'WR': 0, 'TE': 0}}
-    team_totals = defaultdict(lambda: {'QB': 0, 'RB': 0, 'WR': 0, 'TE': 0}) 
+    # JSON object keys are always strings; convert them to integer roster ids once, here
+    roster_name_map = {int(roster_id): team_name for roster_id, team_name in roster_name_map.items()}
+
+    # Map each tracked player id straight to its column in the totals array (-1 for untracked positions)
+    player_pos_idx = {
+        player_id: POSITION_INDEX[position]
+        for player_id, position in player_positions.items()
+        if position in POSITION_INDEX
+    }
+
+    # 2. Collect one (roster, position, score) entry per tracked starter per week.
+    # The totals live in a NumPy array indexed by [roster_id, position] that is filled in one scatter-add.
+    roster_ids, position_indices, scores = [], [], []
 
     # 3. Process all weekly matchup files
     print(f"Processing YTD matchup data from directory: {YTD_DATA_DIR}...")
     
-    for filename in os.listdir(YTD_DATA_DIR):
-        if filename.endswith('.json'):
-            file_path = os.path.join(YTD_DATA_DIR, filename)
-            
-            try:
-                with open(file_path, 'r') as f:
-                    matchup_data = json.load(f)
-            except Exception as e:
-                print(f"     ❌ Error loading {filename}: {e}. Skipping.")
+    with os.scandir(YTD_DATA_DIR) as entries:
+        week_files = sorted((entry.path, entry.stat().st_mtime_ns) for entry in entries if entry.name.endswith('.json'))
+
+    # Use the flat matchup table get_matchups.py saves alongside the weekly files, unless it is stale
+    df_matchups = load_matchups_table(YTD_DATA_DIR, week_files)
+
+    if df_matchups is not None:
+        # Columnar path: no JSON to parse, just pick out the tracked starters
+        starters = df_matchups[df_matchups['is_starter'] & df_matchups['roster_id'].notna()]
+        position_indices = starters['player_id'].map(player_pos_idx).fillna(-1).to_numpy(dtype=np.int64)
+        tracked = position_indices >= 0
+        roster_ids = starters['roster_id'].to_numpy(dtype=np.int64)[tracked]
+        position_indices = position_indices[tracked]
+        scores = starters['points'].fillna(0).to_numpy()[tracked]
+    else:
+        # Read and parse the weekly files on a thread pool so the disk reads overlap
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            weekly_data = list(executor.map(lambda week_file: load_week_data(*week_file), week_files))
+
+        for matchup_data in weekly_data:
+            if matchup_data is None:
                 continue
-            
+
             # Iterate through each team's object in the weekly data
             for team in matchup_data:
-                roster_id = str(team.get('roster_id')) # Ensure ID is string for map lookup
+                roster_id = team.get('roster_id')
                 players_scores = team.get('players_points', {})
                 starters = team.get('starters', [])
 
-                if not roster_id: continue 
+                if roster_id is None: continue 
+                roster_id = int(roster_id) # Roster ids are small integers, used directly as array rows
 
                 # Iterate through all starters for this team this week
                 for player_id in starters:
-                    
-                    # Get position from the Player Map
-                    player_info = player_map.get(player_id, {})
-                    position = player_info.get('position')
-                    
-                    # Get the score for the week
-                    score = players_scores.get(player_id, 0)
-                    
-                    # Accumulate score if the position is tracked
-                    if position in POSITIONS_OF_INTEREST:
-                        team_totals[roster_id][position] += score
-
-            
-    # 4. Convert results to a Pandas DataFrame
-    results_list = []
-    for roster_id, data in team_totals.items():
-        # Get the Team Name from the map
-        team_name = roster_name_map.get(roster_id, f'Roster {roster_id} (Unknown)')
-        
-        data['Team Name'] = team_name
-        data['Roster ID'] = roster_id
-        results_list.append(data)
-        
-    df = pd.DataFrame(results_list)
+                    position_index = player_pos_idx.get(player_id, -1)
+
+                    # Record the score if the position is tracked
+                    if position_index >= 0:
+                        roster_ids.append(roster_id)
+                        position_indices.append(position_index)
+                        scores.append(players_scores.get(player_id, 0))
+
+    if len(roster_ids) == 0:
+        print("❌ ERROR: No starter scores were found for the tracked positions. Check the matchup data.")
+        return
+
+    # 4. Accumulate every score into its [roster_id, position] cell at once
+    roster_ids = np.asarray(roster_ids)
+    totals = np.zeros((roster_ids.max() + 1, len(POSITIONS_OF_INTEREST)))
+    np.add.at(totals, (roster_ids, np.asarray(position_indices)), scores)
+
+    # Only rosters that started at least one tracked player get a row
+    active_roster_ids = np.unique(roster_ids)
+    df = pd.DataFrame(totals[active_roster_ids], columns=POSITIONS_OF_INTEREST)
+    df['Roster ID'] = active_roster_ids
+
+    # Get the Team Name from the map
+    df['Team Name'] = [
+        roster_name_map.get(roster_id, f'Roster {roster_id} (Unknown)')
+        for roster_id in active_roster_ids.tolist()
+    ]
 
     # Calculate Total Starter Points
     df['Total Starter Points'] = df[POSITIONS_OF_INTEREST].sum(axis=1)
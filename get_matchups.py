@@ -1,6 +1,9 @@
+import argparse
 import requests
-import json
 import os
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from sleeper_cache import ETAG_CACHE_FILE, MATCHUPS_TABLE_FILE, etag_headers, load_etag_cache, load_json, load_matchups_table, save_json
 
 # --- CONFIGURATION (UPDATE THESE VALUES) ---
 LEAGUE_ID = "1189644119835193344"  # <-- IMPORTANT: Replace with your actual League ID
@@ -10,8 +13,77 @@ OUTPUT_DIR = "ytd_matchups_data"   # Directory to save all weekly files
 # --- API URL Template ---
 BASE_URL = f"https://api.sleeper.app/v1/league/{LEAGUE_ID}/matchups/"
 
-def fetch_ytd_matchups():
-    """Fetches matchup data from Week 1 up to the CURRENT_WEEK."""
+def save_matchups_table():
+    """
+    Flattens every saved week into one (week, roster_id, player_id, points, is_starter) table
+    and writes it to MATCHUPS_TABLE_FILE inside OUTPUT_DIR. Rebuilt in full each run, so re-downloaded weeks replace their old rows.
+    """
+    rows = []
+    for week in range(1, CURRENT_WEEK + 1):
+        week_path = os.path.join(OUTPUT_DIR, f"matchups_week_{week}.json")
+        if not os.path.exists(week_path):
+            continue
+        with open(week_path, 'rb') as f:
+            raw = f.read()
+        week_data = load_json(raw)
+
+        for team in week_data:
+            players_points = team.get('players_points') or {}
+            starters = team.get('starters') or []
+            # Starters are normally a subset of players; the union keeps any that aren't
+            player_ids = list(dict.fromkeys((team.get('players') or []) + starters))
+            starter_ids = set(starters)
+            for player_id in player_ids:
+                rows.append((week, team.get('roster_id'), player_id, players_points.get(player_id), player_id in starter_ids))
+
+    df_matchups = pd.DataFrame(rows, columns=['week', 'roster_id', 'player_id', 'points', 'is_starter'])
+    df_matchups['points'] = df_matchups['points'].astype('float64') # Missing points are stored as NaN
+    table_path = os.path.join(OUTPUT_DIR, MATCHUPS_TABLE_FILE)
+    try:
+        df_matchups.to_parquet(table_path, index=False, compression='zstd')
+        print(f"Matchup table saved to: {os.path.abspath(table_path)}")
+    except ImportError:
+        # No Parquet engine installed; the analysis scripts simply keep reading the weekly JSON files
+        print(f"Skipping {MATCHUPS_TABLE_FILE} (install pyarrow to write it).")
+
+def fetch_week(session, week, etag_cache, pretty=False):
+    """Fetches a single week's matchup data and saves it to its weekly file. Returns True if the file was written."""
+    week_url = BASE_URL + str(week)
+    output_path = os.path.join(OUTPUT_DIR, f"matchups_week_{week}.json")
+    
+    print(f"  -> Fetching Week {week} data...")
+    
+    try:
+        # Make the GET request (conditional if this week is already on disk)
+        headers = etag_headers(etag_cache, week_url, output_path)
+        response = session.get(week_url, headers=headers, timeout=30)
+        response.raise_for_status() 
+
+        # 304 Not Modified: the saved week is still current, so there's nothing to write
+        if response.status_code == 304:
+            print(f"     ✅ Week {week} unchanged, keeping {output_path}")
+            return False
+
+        matchup_data = load_json(response.content)
+        
+        # Save the data to its specific weekly file
+        save_json(matchup_data, output_path, pretty=pretty)
+        if response.headers.get('ETag'):
+            etag_cache[week_url] = response.headers['ETag']
+        
+        print(f"     ✅ Week {week} saved to {output_path}")
+        return True
+
+    except requests.exceptions.RequestException as e:
+        # A failed week is reported and skipped; the other weeks still complete
+        print(f"     ❌ Error fetching Week {week}: {e}")
+        return False
+
+def fetch_ytd_matchups(pretty=False):
+    """
+    Fetches matchup data from Week 1 up to the CURRENT_WEEK.
+    Files are written as compact JSON unless pretty is True.
+    """
     
     if LEAGUE_ID == "YOUR_LEAGUE_ID_HERE":
         print("❌ ERROR: Please update the LEAGUE_ID variable in the script with your actual ID.")
@@ -24,33 +96,34 @@ def fetch_ytd_matchups():
 
     print(f"Starting data pull for League ID {LEAGUE_ID} (Weeks 1 through {CURRENT_WEEK})...")
     
-    all_matchups_data = {}
+    # 2. Fetch every week concurrently over one pooled session, so the pull takes
+    #    roughly one round trip instead of one per week
+    etag_cache = load_etag_cache()
+    with requests.Session() as session:
+        session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=CURRENT_WEEK))
+        with ThreadPoolExecutor(max_workers=CURRENT_WEEK) as executor:
+            weeks_written = list(executor.map(lambda week: fetch_week(session, week, etag_cache, pretty), range(1, CURRENT_WEEK + 1)))
 
-    for week in range(1, CURRENT_WEEK + 1):
-        week_url = BASE_URL + str(week)
-        output_path = os.path.join(OUTPUT_DIR, f"matchups_week_{week}.json")
-        
-        print(f"  -> Fetching Week {week} data...")
-        
-        try:
-            # 2. Make the GET request
-            response = requests.get(week_url, timeout=30)
-            response.raise_for_status() 
-
-            matchup_data = response.json()
-            
-            # 3. Save the data to its specific weekly file
-            with open(output_path, 'w') as f:
-                json.dump(matchup_data, f, indent=4)
-            
-            print(f"     ✅ Week {week} saved to {output_path}")
-
-        except requests.exceptions.RequestException as e:
-            print(f"     ❌ Error fetching Week {week}: {e}")
-            # Continue to the next week if one fails
-            continue 
+    # 3. Remember the ETags so the next run only downloads weeks that changed
+    save_json(etag_cache, ETAG_CACHE_FILE)
+
+    # 4. Refresh the single-file table the analysis scripts load instead of the weekly JSONs.
+    #    If no week was rewritten and the table already holds exactly the saved weeks, it is still current.
+    week_paths = [
+        (week_path, os.stat(week_path).st_mtime_ns)
+        for week_path in (os.path.join(OUTPUT_DIR, f"matchups_week_{week}.json") for week in range(1, CURRENT_WEEK + 1))
+        if os.path.exists(week_path)
+    ]
+    if any(weeks_written) or load_matchups_table(OUTPUT_DIR, week_paths) is None:
+        save_matchups_table()
+    else:
+        print(f"No weeks changed; keeping {os.path.join(OUTPUT_DIR, MATCHUPS_TABLE_FILE)}")
     
     print("\nData pull complete! All individual weekly files have been saved.")
 
 if __name__ == "__main__":
-    fetch_ytd_matchups()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download YTD matchup data from the Sleeper API.")
+    parser.add_argument('--pretty', action='store_true', help="indent the saved JSON for reading (larger files, slower writes)")
+    args = parser.parse_args()
+
+    fetch_ytd_matchups(pretty=args.pretty)
\ No newline at end of file
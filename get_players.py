@@ -1,7 +1,9 @@
+import argparse
 import requests
-import json
 import os
+import pandas as pd
 from datetime import datetime
+from sleeper_cache import ETAG_CACHE_FILE, etag_headers, load_etag_cache, load_json, save_json, slim_file_is_current
 
 # --- Configuration ---
 # Sleeper API endpoint for all NFL players
@@ -11,25 +13,62 @@ PLAYER_API_URL = "https://api.sleeper.app/v1/players/nfl"
 
 OUTPUT_FILE = f"sleeper_players.json"
 
+# Slim Parquet copy holding only the fields the analysis scripts read (needs pyarrow)
+SLIM_OUTPUT_FILE = "players_slim.parquet"
+
+def save_slim_players(player_data):
+    """Writes each player's position, name and injury status to the slim Parquet file."""
+    df_slim = pd.DataFrame(
+        [
+            (p_id, details.get('position'), details.get('full_name'), details.get('injury_status'))
+            for p_id, details in player_data.items()
+        ],
+        columns=['pid', 'pos', 'name', 'injury_status']
+    )
+    try:
+        df_slim.to_parquet(SLIM_OUTPUT_FILE, index=False)
+        print(f"Slim player file saved to: {os.path.abspath(SLIM_OUTPUT_FILE)}")
+    except ImportError:
+        # No Parquet engine installed; the analysis scripts simply keep reading the JSON
+        print(f"Skipping {SLIM_OUTPUT_FILE} (install pyarrow to write it).")
+
 # --- Function to Fetch and Save Data ---
-def fetch_and_save_players():
-    """Fetches all NFL player data from Sleeper and saves it to a JSON file."""
+def fetch_and_save_players(pretty=False):
+    """
+    Fetches all NFL player data from Sleeper and saves it to a JSON file.
+    The file is written as compact JSON unless pretty is True.
+    """
     print("Fetching all NFL player data from Sleeper API...")
 
+    etag_cache = load_etag_cache()
+
     try:
-        # 1. Make the GET request to the Sleeper API
-        response = requests.get(PLAYER_API_URL, timeout=30)
+        # 1. Make the GET request to the Sleeper API (conditional if we already have a copy)
+        headers = etag_headers(etag_cache, PLAYER_API_URL, OUTPUT_FILE)
+        response = requests.get(PLAYER_API_URL, headers=headers, timeout=30)
         
         # Raise an exception for bad status codes (4xx or 5xx)
         response.raise_for_status() 
 
+        # 304 Not Modified: the file on disk is still current, so skip the download and parse
+        if response.status_code == 304:
+            print(f"✅ Player data is unchanged since the last download. Keeping {os.path.abspath(OUTPUT_FILE)}")
+            # The slim file can still be missing or stale (e.g. pyarrow was installed after the last download)
+            if not slim_file_is_current(SLIM_OUTPUT_FILE, OUTPUT_FILE):
+                with open(OUTPUT_FILE, 'rb') as f:
+                    raw = f.read()
+                save_slim_players(load_json(raw))
+            return
+
         # 2. Get the JSON response (which is a massive dictionary)
-        player_data = response.json()
+        player_data = load_json(response.content)
 
-        # 3. Save the data to a local JSON file
-        with open(OUTPUT_FILE, 'w') as f:
-            # The indent=4 makes the file readable for inspection
-            json.dump(player_data, f, indent=4)
+        # 3. Save the data to a local JSON file (compact; run with --pretty to inspect it by eye)
+        save_json(player_data, OUTPUT_FILE, pretty=pretty)
+        if response.headers.get('ETag'):
+            etag_cache[PLAYER_API_URL] = response.headers['ETag']
+            save_json(etag_cache, ETAG_CACHE_FILE)
+        save_slim_players(player_data)
         
         # 4. Report success
         print(f"✅ Success! Data for {len(player_data)} players downloaded.")
@@ -42,4 +81,8 @@ def fetch_and_save_players():
         print(f"❌ An unexpected error occurred: {e}")
 
 if __name__ == "__main__":
-    fetch_and_save_players()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download all NFL player data from the Sleeper API.")
+    parser.add_argument('--pretty', action='store_true', help="indent the saved JSON for reading (larger file, slower write)")
+    args = parser.parse_args()
+
+    fetch_and_save_players(pretty=args.pretty)
\ No newline at end of file
@@ -1,6 +1,5 @@
 import requests
-import json
-import os
+from sleeper_cache import ETAG_CACHE_FILE, etag_headers, load_etag_cache, load_json, save_json
 
 # --- CONFIGURATION ---
 # !!! IMPORTANT: Replace 'YOUR_LEAGUE_ID' with your actual Sleeper League ID
@@ -10,6 +9,19 @@ ROSTER_NAME_MAP_FILE = 'roster_name_map.json'
 # --- API ENDPOINTS ---
 BASE_URL = 'https://api.sleeper.app/v1/'
 
+def fetch_json(url, etag_cache, conditional=True):
+    """
+    GETs url and returns the parsed JSON body, recording its ETag in etag_cache.
+    Returns None on 304 Not Modified (only possible when conditional is True).
+    """
+    headers = etag_headers(etag_cache, url, ROSTER_NAME_MAP_FILE) if conditional else {}
+    response = requests.get(url, headers=headers)
+    if response.status_code == 304:
+        return None
+    if response.headers.get('ETag'):
+        etag_cache[url] = response.headers['ETag']
+    return load_json(response.content)
+
 def fetch_and_create_roster_map(league_id: str):
     """
     Fetches league rosters and user data from the Sleeper API,
@@ -21,19 +33,28 @@ def fetch_and_create_roster_map(league_id: str):
 
     print(f"Fetching data for League ID: {league_id}...")
 
-    # 1. Fetch Rosters
+    etag_cache = load_etag_cache()
     rosters_url = f'{BASE_URL}league/{league_id}/rosters'
-    rosters_response = requests.get(rosters_url)
-    rosters_data = rosters_response.json()
+    users_url = f'{BASE_URL}league/{league_id}/users'
+
+    # 0. Conditional requests: if neither rosters nor users changed, the saved map is still current
+    rosters_data = fetch_json(rosters_url, etag_cache)
+    users_data = fetch_json(users_url, etag_cache)
+    if rosters_data is None and users_data is None:
+        print(f"\n✅ Rosters and users are unchanged. Keeping the existing {ROSTER_NAME_MAP_FILE}.")
+        return
+
+    # 1. Fetch Rosters (again without the ETag if only the users changed)
+    if rosters_data is None:
+        rosters_data = fetch_json(rosters_url, etag_cache, conditional=False)
     
     if not isinstance(rosters_data, list):
         print("ERROR: Failed to fetch rosters. Check if the League ID is correct.")
         return
 
-    # 2. Fetch Users (Owners)
-    users_url = f'{BASE_URL}league/{league_id}/users'
-    users_response = requests.get(users_url)
-    users_data = users_response.json()
+    # 2. Fetch Users (Owners) (again without the ETag if only the rosters changed)
+    if users_data is None:
+        users_data = fetch_json(users_url, etag_cache, conditional=False)
 
     if not isinstance(users_data, list):
         print("ERROR: Failed to fetch user data.")
@@ -55,12 +76,12 @@ def fetch_and_create_roster_map(league_id: str):
         
         if roster_id and owner_id:
             team_name = user_map.get(owner_id, f'Owner {owner_id}')
-            roster_name_map[roster_id] = team_name
+            roster_name_map[int(roster_id)] = team_name # Saved as "1", "2", ... since JSON keys are strings
             
     # 5. Save the map to a JSON file
     if roster_name_map:
-        with open(ROSTER_NAME_MAP_FILE, 'w') as f:
-            json.dump(roster_name_map, f, indent=4)
+        save_json(roster_name_map, ROSTER_NAME_MAP_FILE, pretty=True)
+        save_json(etag_cache, ETAG_CACHE_FILE)
         print(f"\n✅ Successfully created {ROSTER_NAME_MAP_FILE} with {len(roster_name_map)} teams.")
     else:
         print("\nERROR: No rosters or users were successfully mapped.")
@@ -1,10 +1,25 @@
 import pandas as pd
-import json
+import csv
 import os
+import mmap
 import numpy as np
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from sleeper_cache import load_matchups_table, parse_week_num, read_slim_players, slim_file_is_current
+
+try:
+    import orjson as _json
+except ImportError:  # orjson is optional; the standard library parser is slower but equivalent
+    import json as _json
+
+try:
+    import simdjson
+except ImportError:  # pysimdjson is optional; without it the player file is parsed in full
+    simdjson = None
 
 # --- FILE CONFIGURATION ---
 PLAYER_DATA_FILE = 'sleeper_players.json'
+PLAYER_SLIM_FILE = 'players_slim.parquet' # Written by get_players.py; used instead of the JSON when up to date
 ROSTER_NAME_MAP_FILE = 'roster_name_map.json'
 # NOTE: Ensure you have a directory named 'ytd_matchups_data' containing all matchups_week_X.json files
 DATA_FOLDER = 'ytd_matchups_data' 
@@ -27,50 +42,86 @@ MIN_PLAYING_SCORE = 0.1
 
 # --- MAP LOADING FUNCTIONS (USING STANDARD PYTHON FILE OPERATIONS) ---
 
-def load_maps():
+def parse_mapped_file(file_path, parse=_json.loads):
     """
-    Loads player data and roster data from local files.
+    Parses a JSON file straight out of a read-only memory map, so the kernel pages it in
+    on demand instead of the whole file first being copied into a bytes object.
     """
-    
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as view:
+            try:
+                return parse(view)
+            except TypeError:
+                # The standard library json only accepts str/bytes, so it gets a copy after all
+                return parse(view.tobytes())
+
+
+def load_player_records():
+    """
+    Returns a (player_id, position, full_name, injury_status) tuple for every player.
+    Uses the slim Parquet file written by get_players.py when it is at least as new as the JSON.
+    """
+    if slim_file_is_current(PLAYER_SLIM_FILE, PLAYER_DATA_FILE):
+        print(f"Loading player data from {PLAYER_SLIM_FILE}...")
+        try:
+            return read_slim_players(PLAYER_SLIM_FILE, ['pid', 'pos', 'name', 'injury_status'])
+        except Exception as e:
+            print(f"Could not read {PLAYER_SLIM_FILE} ({e}), falling back to {PLAYER_DATA_FILE}.")
+
     print(f"Loading player data from {PLAYER_DATA_FILE}...")
     try:
-        with open(PLAYER_DATA_FILE, 'r') as f:
-            player_data = json.load(f)
+        if simdjson is not None:
+            # Only the three fields read below are pulled off the simdjson tape; the rest are never built
+            parser = simdjson.Parser()
+            player_data = parse_mapped_file(PLAYER_DATA_FILE, parser.parse)
+        else:
+            player_data = parse_mapped_file(PLAYER_DATA_FILE)
     except Exception as e:
         print(f"FATAL ERROR loading {PLAYER_DATA_FILE}: {e}")
+        return None
+
+    return [
+        (p_id, details.get('position'), details.get('full_name'), details.get('injury_status'))
+        for p_id, details in player_data.items()
+    ]
+
+
+def load_maps():
+    """
+    Loads player data and roster data from local files.
+    """
+    
+    player_records = load_player_records()
+    if player_records is None:
         return None, None, None, None, None
         
-    position_map = {} # Used for median calculation
-    full_position_map = {} # Used for ownership tracking
+    position_map = {} # Used for median calculation and ownership tracking
     name_map = {}
     ir_players = {} # Used to flag players as IR
     
-    for p_id, details in player_data.items():
-        position = details.get('position')
-        full_name = details.get('full_name')
-        injury_status = details.get('injury_status')
-        
+    # Single pass over the players: each map gets at most one insert per player
+    for p_id, position, full_name, injury_status in player_records:
         if position and full_name:
-            standard_position = position.replace('DEF', 'D/ST')
+            standard_position = 'D/ST' if position == 'DEF' else position
 
-            # 1. Populate the map used for ownership tracking (all players)
-            full_position_map[p_id] = standard_position
+            # 1. Populate the position map (all players, including IR) and the name map
+            position_map[p_id] = standard_position
             name_map[p_id] = full_name
             
             # 2. Flag IR players. 
             if injury_status == "IR":
                 ir_players[p_id] = {'Player_Name': full_name, 'Position': standard_position}
-            
-            # 3. Populate the map used for median calculation (includes all eligible players)
-            position_map[p_id] = standard_position
+    
+    # The ownership-tracking map always held exactly the same entries, so share one dict
+    full_position_map = position_map
     
     print(f"Loaded player data for {len(position_map)} total players (including IR).")
 
     # 4. Load Roster Map (ID to Team Name)
     print(f"Loading roster map from {ROSTER_NAME_MAP_FILE}...")
     try:
-        with open(ROSTER_NAME_MAP_FILE, 'r') as f:
-            roster_map = {str(k): v for k, v in json.load(f).items()}
+        # JSON object keys are always strings; convert them to integer roster ids once, here
+        roster_map = {int(k): v for k, v in parse_mapped_file(ROSTER_NAME_MAP_FILE).items()}
     except Exception as e:
         print(f"FATAL ERROR loading {ROSTER_NAME_MAP_FILE}: {e}")
         return None, None, None, None, None
@@ -80,104 +131,116 @@ def load_maps():
 
 # --- DATA PROCESSING FUNCTION (MEDIAN LOGIC UPDATED) ---
 
+@functools.lru_cache(maxsize=64) # Bounded, so edited files don't pile up parsed copies in a long session
+def read_week_file(file_path, mtime_ns):
+    """
+    Reads and parses a single weekly matchup file.
+    Memoized on (file_path, mtime_ns), so repeat runs in one session skip the parse
+    unless the file has changed on disk. Errors are raised, so a failed load is never cached.
+    """
+    with open(file_path, 'rb') as f:
+        return _json.loads(f.read())
+
+
+def load_week_file(file_path, mtime_ns):
+    """Loads a single weekly matchup file through the cache. Returns None if it can't be loaded."""
+    try:
+        return read_week_file(file_path, mtime_ns)
+    except Exception as e:
+        print(f"Error loading {os.path.basename(file_path)}: {e}")
+        return None
+
+
 def process_matchup_data(position_map, name_map, roster_map, full_position_map, data_folder=DATA_FOLDER):
     """
     Processes all weekly matchup data, tracks scores, handles trade logic, and applies filters.
     Median score now includes 0-point weeks if the player was a starter.
     """
     print(f"\nProcessing matchup data from {data_folder}...")
-    all_player_scores = []
-    player_ownership_history = {} 
     
-    ELIGIBLE_POSITIONS = ['QB', 'RB', 'WR', 'TE']
+    ELIGIBLE_POSITIONS = frozenset(['QB', 'RB', 'WR', 'TE'])
 
     if not os.path.exists(data_folder):
         print(f"FATAL ERROR: Matchup data folder '{data_folder}' was not found.")
         return None, None, {}
 
     # Pre-scan for max_week_num and the data file
-    all_files = os.listdir(data_folder)
-    max_week_num = 0
-    max_week_filename = None
-    
-    for filename in all_files:
-        if filename.startswith("matchups_week_") and filename.endswith(".json"):
-            try:
-                week_num = int(filename.split('_')[2].split('.')[0])
-                if week_num > max_week_num:
-                    max_week_num = week_num
-                    max_week_filename = filename
-            except:
-                continue
-                
+    with os.scandir(data_folder) as entries:
+        file_mtimes = {entry.name: entry.stat().st_mtime_ns for entry in entries}
+    # Every matchups_week_<N>.json file with its week number, parsed once here (other names are skipped)
+    week_nums_by_file = {}
+    for filename in sorted(file_mtimes):
+        week_num = parse_week_num(filename)
+        if week_num is not None:
+            week_nums_by_file[filename] = week_num
+    week_paths = [(os.path.join(data_folder, f), file_mtimes[f]) for f in week_nums_by_file]
+    max_week_num = max(week_nums_by_file.values(), default=0)
+
     if max_week_num == 0:
         print("ERROR: Could not determine the latest week from file names.")
         return pd.DataFrame(), pd.DataFrame(), {}
-        
-    players_in_max_week = set() # To hold players owned in the final week
 
-    # Step 1: Accumulate scores and track latest ownership
-    for filename in all_files:
-        if filename.startswith("matchups_week_") and filename.endswith(".json"):
-            file_path = os.path.join(data_folder, filename)
-            
-            try:
-                with open(file_path, 'r') as f:
-                    week_data = json.load(f)
-            except Exception as e:
-                print(f"Error loading {filename}: {e}")
-                continue
-            
-            if not isinstance(week_data, list): continue
+    # Players at a tracked position, built once so the eligibility test is a single hash per row
+    eligible_ids = frozenset(p_id for p_id, position in full_position_map.items() if position in ELIGIBLE_POSITIONS)
+
+    # Step 1: One row per rostered player-week (Player_ID, Roster_ID, Week, Points, Is_Starter);
+    # scores and ownership both come from it.
+    # Use the flat matchup table get_matchups.py saves alongside the weekly files, unless it is stale
+    df_matchups = load_matchups_table(data_folder, week_paths)
+
+    if df_matchups is not None:
+        # The table already holds exactly these columns, so there is no JSON to parse or flatten
+        players_in_max_week = set(df_matchups.loc[df_matchups['week'] == max_week_num, 'player_id'])
+        df_weeks = df_matchups.rename(columns={
+            'player_id': 'Player_ID',
+            'roster_id': 'Roster_ID',
+            'week': 'Week',
+            'points': 'Points',
+            'is_starter': 'Is_Starter',
+        })
+    else:
+        # Read and parse the weekly files on a thread pool so the disk reads overlap
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            loaded_weeks = list(executor.map(lambda week_path: load_week_file(*week_path), week_paths))
 
-            # Determine the current week number from the filename
-            try:
-                week_num = int(filename.split('_')[2].split('.')[0])
-            except:
-                continue
+        players_in_max_week = set() # To hold players owned in the final week
+        player_ids, roster_ids, week_nums, points, is_starter = [], [], [], [], []
+        for week_num, week_data in zip(week_nums_by_file.values(), loaded_weeks):
+            if not isinstance(week_data, list): continue # Also skips files that failed to load
 
             for box_score in week_data:
-                roster_id = str(box_score.get('roster_id'))
+                roster_id = box_score.get('roster_id') # Integer roster id, matching roster_map's keys
                 players = box_score.get('players', [])
                 player_points_map = box_score.get('players_points', {}) 
                 starters = box_score.get('starters', []) # <--- NEW: Get starter list
                 
                 # --- Track players owned in the *latest* week ---
-                if filename == max_week_filename:
+                if week_num == max_week_num:
                     players_in_max_week.update(players)
 
                 if not players: continue
 
-                for player_id in players:
-                    position = full_position_map.get(player_id) 
-                    
-                    if position in ELIGIBLE_POSITIONS:
-                        points = player_points_map.get(player_id)
-                        
-                        # --- NEW MEDIAN LOGIC ---
-                        score_to_include = None
+                starter_ids = set(starters)
+                player_ids.extend(players)
+                roster_ids.extend([roster_id] * len(players))
+                week_nums.extend([week_num] * len(players))
+                points.extend([player_points_map.get(player_id) for player_id in players])
+                is_starter.extend([player_id in starter_ids for player_id in players])
+
+        df_weeks = pd.DataFrame({
+            'Player_ID': player_ids,
+            'Roster_ID': roster_ids,
+            'Week': week_nums,
+            'Points': pd.Series(points, dtype='float64'), # None -> NaN
+            'Is_Starter': is_starter,
+        })
+
+    # Player ids repeat every week, so store them as a categorical: each distinct id is hashed once here
+    # and the isin/drop_duplicates/median passes below work on its small integer codes
+    df_weeks['Player_ID'] = pd.Categorical(df_weeks['Player_ID'])
+    df_weeks = df_weeks[df_weeks['Player_ID'].isin(eligible_ids)]
                         
-                        if points is not None:
-                            is_starter = player_id in starters
-                            
-                            # Case 1: Score is high enough (e.g., > 0.1). Always include.
-                            if points >= MIN_PLAYING_SCORE:
-                                score_to_include = points
-                                
-                            # Case 2: Score is low (e.g., 0.0 or 0.05). 
-                            # ONLY include if the player was a STARTER.
-                            elif is_starter:
-                                score_to_include = points
-                                
-                        if score_to_include is not None:
-                            all_player_scores.append([player_id, score_to_include])
-                        # --- END NEW MEDIAN LOGIC ---
-                        
-                        # --- TRADE LOGIC: Update ownership for ALL eligible positions ---
-                        if player_id not in player_ownership_history or week_num >= player_ownership_history[player_id]['week']:
-                            player_ownership_history[player_id] = {'roster_id': roster_id, 'week': week_num}
-                            
-    if not player_ownership_history:
+    if df_weeks.empty:
         print("ERROR: No player scores or ownership history successfully loaded. Check data consistency.")
         return None, None, {} 
 
@@ -188,27 +251,40 @@ def process_matchup_data(position_map, name_map, roster_map, full_position_map,
         
     players_retained = players_in_max_week
     
-    # Finalize player_to_roster map based on the latest week seen
-    player_to_roster = {
-        p_id: data['roster_id'] 
-        for p_id, data in player_ownership_history.items() 
-        if p_id in players_retained
-    }
+    # --- TRADE LOGIC: each player belongs to the roster from the latest week they appear in ---
+    # (stable sort, so within a week the last team processed wins, as before)
+    latest_ownership = df_weeks.sort_values(by='Week', kind='stable').drop_duplicates('Player_ID', keep='last')
+    latest_ownership = latest_ownership[latest_ownership['Player_ID'].isin(players_retained)]
+    player_to_roster = dict(zip(latest_ownership['Player_ID'], latest_ownership['Roster_ID']))
     
-    # Check if there are any scores left after filtering for currently owned players
-    if not all_player_scores:
-        return pd.DataFrame(), pd.DataFrame(), player_to_roster
-
-    df_scores = pd.DataFrame(all_player_scores, columns=['Player_ID', 'Points'])
+    # --- NEW MEDIAN LOGIC ---
+    # Case 1: Score is high enough (e.g., > 0.1). Always include.
+    # Case 2: Score is low (e.g., 0.0 or 0.05). ONLY include if the player was a STARTER.
+    # Players without a recorded score (NaN) never count.
+    counts_toward_median = (df_weeks['Points'] >= MIN_PLAYING_SCORE) | (df_weeks['Is_Starter'] & df_weeks['Points'].notna())
+    df_scores = df_weeks.loc[counts_toward_median, ['Player_ID', 'Points']]
     df_scores = df_scores[df_scores['Player_ID'].isin(players_retained)].copy() # Filter scores for retained players
+    # --- END NEW MEDIAN LOGIC ---
     
     if df_scores.empty:
         # No retained players have median-eligible scores
         return pd.DataFrame(), pd.DataFrame(), player_to_roster
 
-    # Calculate median and score count
-    df_stats = df_scores.groupby('Player_ID')['Points'].agg(['median', 'count']).reset_index()
-    df_stats.rename(columns={'median': 'Median_Points', 'count': 'Score_Count'}, inplace=True)
+    # Calculate median and score count with NumPy: after one sort by (player, points),
+    # each player's scores form a contiguous run and the median sits in its middle.
+    # Players are sorted by their categorical codes (small ints, in player id order) rather than the id strings.
+    player_cat = df_scores['Player_ID'].cat
+    player_codes = player_cat.codes.to_numpy()
+    score_values = df_scores['Points'].to_numpy(dtype=np.float64)
+    order = np.lexsort((score_values, player_codes))
+    player_codes, score_values = player_codes[order], score_values[order]
+    unique_codes, starts, counts = np.unique(player_codes, return_index=True, return_counts=True)
+    medians = (score_values[starts + (counts - 1) // 2] + score_values[starts + counts // 2]) / 2
+    df_stats = pd.DataFrame({
+        'Player_ID': player_cat.categories[unique_codes].to_numpy(),
+        'Median_Points': medians,
+        'Score_Count': counts,
+    })
     
     # --- EXCLUSION CHECK 2 & 3: Only Single Matchup Filter Remains ---
     players_to_exclude_zeros = set() # Two-Week Zeroes Filter is REMOVED
@@ -231,10 +307,12 @@ def process_matchup_data(position_map, name_map, roster_map, full_position_map,
 
     df_median.drop(columns=['Score_Count'], inplace=True) 
     
-    # Merge with maps
-    df_median['Position'] = df_median['Player_ID'].map(position_map) 
-    df_median['Player_Name'] = df_median['Player_ID'].map(name_map)
-    df_median['Roster_ID'] = df_median['Player_ID'].map(player_to_roster)
+    # Merge with maps. Plain dict lookups over the few hundred scored players; Series.map would
+    # first turn each whole map (every player in the league file) into an indexed Series.
+    median_ids = df_median['Player_ID'].tolist()
+    df_median['Position'] = [position_map.get(p_id) for p_id in median_ids]
+    df_median['Player_Name'] = [name_map.get(p_id) for p_id in median_ids]
+    df_median['Roster_ID'] = [player_to_roster.get(p_id) for p_id in median_ids]
     
     # Final cleanup and sort
     df_median = df_median.dropna(subset=['Position', 'Roster_ID'])
@@ -243,8 +321,7 @@ def process_matchup_data(position_map, name_map, roster_map, full_position_map,
     
     # Prepare excluded single-matchup players list for output
     excluded_single_matchup_list = []
-    for index, row in excluded_single_matchup_data.iterrows():
-        p_id = row['Player_ID']
+    for p_id, median_points in zip(excluded_single_matchup_data['Player_ID'], excluded_single_matchup_data['Median_Points']):
         # Must be currently owned
         if p_id not in players_retained: continue 
         
@@ -256,7 +333,7 @@ def process_matchup_data(position_map, name_map, roster_map, full_position_map,
                 'Roster_ID': roster_id,
                 'Position': position,
                 'Player_Name': name_map.get(p_id),
-                'Median_Points': row['Median_Points'],
+                'Median_Points': median_points,
                 'Reason': 'Single Matchup Filter'
             })
         
@@ -267,6 +344,18 @@ def process_matchup_data(position_map, name_map, roster_map, full_position_map,
 
 # --- OPTIMAL LINEUP SELECTION (FILTERS OUT IR PLAYERS) ---
 
+def take_top_per_team(team_starts, team_sizes, candidates, count):
+    """
+    Returns a mask marking the first `count` candidate rows of each team.
+    Rows must be grouped by team and in Median_Points order within each team;
+    team_starts/team_sizes give each team's first row and row count.
+    """
+    # Running candidate count, rebased to zero at the start of every team, is each candidate's rank
+    running = np.cumsum(candidates)
+    before_team = np.repeat(np.concatenate(([0], running))[team_starts], team_sizes)
+    return candidates & (running - before_team <= count)
+
+
 def select_optimal_lineup(df_median, ir_player_ids):
     """
     Selects the optimal lineup.
@@ -274,81 +363,43 @@ def select_optimal_lineup(df_median, ir_player_ids):
     """
     
     # --- Filter out IR players from consideration for optimal lineup/backup ---
-    df_active_median = df_median[~df_median['Player_ID'].isin(ir_player_ids)].copy()
-    
-    optimal_lineup_data = []
-    remaining_players = []
+    # df_median is already sorted by (Roster_ID, Median_Points desc), so each team is one contiguous
+    # run of rows and its best players come first; np.unique gives where every run starts.
+    df_active_median = df_median[~df_median['Player_ID'].isin(ir_player_ids)].reset_index(drop=True)
+    position = df_active_median['Position'].to_numpy()
+    _, team_starts, team_sizes = np.unique(df_active_median['Roster_ID'].to_numpy(), return_index=True, return_counts=True)
     
     MANDATORY_SLOTS = {'QB': 1, 'RB': 2, 'WR': 3, 'TE': 1}
+    SLOT_ORDER = ['QB', 'RB', 'WR', 'TE', 'FLEX', 'SUPERFLEX']
 
-    for roster_id, team_df in df_active_median.groupby('Roster_ID'):
-        
-        selected_ids = set()
-        available_pool = team_df.copy()
-        
-        # 1. Select Mandatory Positions (QB, RB, WR, TE)
-        for pos, count in MANDATORY_SLOTS.items():
-            pos_players = available_pool[available_pool['Position'] == pos].head(count)
-            
-            for index, player in pos_players.iterrows():
-                optimal_lineup_data.append({
-                    'Roster_ID': roster_id,
-                    'Position_Slotted': pos, 
-                    'Inherent_Position': player['Position'], 
-                    'Player_Name': player['Player_Name'],
-                    'Median_Points': player['Median_Points'],
-                    'Player_ID': player['Player_ID'] 
-                })
-                selected_ids.add(player['Player_ID'])
+    # 1. Select Mandatory Positions (QB, RB, WR, TE): the top N at each position per team
+    mandatory = np.zeros(len(df_active_median), dtype=bool)
+    for pos, count in MANDATORY_SLOTS.items():
+        mandatory |= take_top_per_team(team_starts, team_sizes, position == pos, count)
+    taken = mandatory.copy()
 
-        # Update the available pool by removing mandatory selections
-        available_pool = available_pool[~available_pool['Player_ID'].isin(selected_ids)]
+    # 2. Select FLEX (2 spots: best remaining RB/WR/TE)
+    flex = take_top_per_team(team_starts, team_sizes, ~taken & np.isin(position, FLEX_ELIGIBLE), STARTER_SLOTS['FLEX'])
+    taken |= flex
 
-        # 2. Select FLEX (2 spots: RB/WR/TE)
-        flex_pool = available_pool[available_pool['Position'].isin(FLEX_ELIGIBLE)].head(STARTER_SLOTS['FLEX'])
-        
-        for index, player in flex_pool.iterrows():
-            optimal_lineup_data.append({
-                'Roster_ID': roster_id,
-                'Position_Slotted': 'FLEX', 
-                'Inherent_Position': player['Position'],
-                'Player_Name': player['Player_Name'],
-                'Median_Points': player['Median_Points'],
-                'Player_ID': player['Player_ID']
-            })
-            selected_ids.add(player['Player_ID'])
+    # 3. Select SUPERFLEX (1 spot: best remaining QB/RB/WR/TE)
+    superflex = take_top_per_team(team_starts, team_sizes, ~taken & np.isin(position, SF_ELIGIBLE), STARTER_SLOTS['SUPERFLEX'])
+    taken |= superflex
 
-        # Update the available pool by removing FLEX selections
-        available_pool = available_pool[~available_pool['Player_ID'].isin(selected_ids)]
-        
-        # 3. Select SUPERFLEX (1 spot: best remaining QB/RB/WR/TE)
-        sf_pool = available_pool[available_pool['Position'].isin(SF_ELIGIBLE)].head(STARTER_SLOTS['SUPERFLEX'])
+    slot = np.where(mandatory, position, None)
+    slot[flex] = 'FLEX'
+    slot[superflex] = 'SUPERFLEX'
 
-        for index, player in sf_pool.iterrows():
-            optimal_lineup_data.append({
-                'Roster_ID': roster_id,
-                'Position_Slotted': 'SUPERFLEX', 
-                'Inherent_Position': player['Position'],
-                'Player_Name': player['Player_Name'],
-                'Median_Points': player['Median_Points'],
-                'Player_ID': player['Player_ID']
-            })
-            selected_ids.add(player['Player_ID'])
+    df_optimal = df_active_median[taken].assign(Position_Slotted=slot[taken])
+    df_optimal['Slot_Order'] = pd.Categorical(df_optimal['Position_Slotted'], categories=SLOT_ORDER, ordered=True)
+    df_optimal = df_optimal.sort_values(by=['Roster_ID', 'Slot_Order'], kind='stable')
+    df_optimal = df_optimal.rename(columns={'Position': 'Inherent_Position', 'Position_Slotted': 'Position'})
+    df_optimal = df_optimal[['Roster_ID', 'Position', 'Inherent_Position', 'Player_Name', 'Median_Points', 'Player_ID']]
 
-        # 4. Collect Remaining Players (for backup analysis)
-        remaining_df = available_pool[~available_pool['Player_ID'].isin(selected_ids)].copy()
-        
-        for index, player in remaining_df.iterrows():
-             remaining_players.append({
-                'Roster_ID': roster_id,
-                'Position': player['Position'], 
-                'Player_Name': player['Player_Name'],
-                'Median_Points': player['Median_Points'],
-                'Player_ID': player['Player_ID']
-            })
+    # 4. Collect Remaining Players (for backup analysis), still in points order within each team
+    df_remaining = df_active_median.loc[~taken, ['Roster_ID', 'Position', 'Player_Name', 'Median_Points', 'Player_ID']]
 
-    df_optimal = pd.DataFrame(optimal_lineup_data).rename(columns={'Position_Slotted': 'Position'})
-    return df_optimal, pd.DataFrame(remaining_players)
+    return df_optimal.reset_index(drop=True), df_remaining.reset_index(drop=True)
 
 
 # --- OUTPUT FORMATTING (WITH IR TRUE SCORE LOOKUP) ---
@@ -361,13 +412,11 @@ def format_output_csv(df_optimal, df_remaining, roster_map, ir_players_dict, df_
     FINAL_COLUMNS = ['Team Name', 'Position', 'Player Name', 'Median Points']
     
     # --- STEP 1: Add Team Name to DataFrames ---
-    roster_name_df = pd.DataFrame(roster_map.items(), columns=['Roster_ID', 'Team Name'])
-    
     if not df_optimal.empty:
-        df_optimal = pd.merge(df_optimal, roster_name_df, on='Roster_ID', how='left')
+        df_optimal = df_optimal.assign(**{'Team Name': df_optimal['Roster_ID'].map(roster_map)})
     
     if not df_remaining.empty:
-        df_remaining = pd.merge(df_remaining, roster_name_df, on='Roster_ID', how='left')
+        df_remaining = df_remaining.assign(**{'Team Name': df_remaining['Roster_ID'].map(roster_map)})
 
     # Calculate totals and sort teams by TOTAL score 
     df_totals = df_optimal.groupby('Roster_ID')['Median_Points'].sum().reset_index()
@@ -378,6 +427,9 @@ def format_output_csv(df_optimal, df_remaining, roster_map, ir_players_dict, df_
     # --- Prepare Disqualified Lists & Maps ---
     category_order = ['QB', 'RB', 'WR', 'TE', 'FLEX', 'SUPERFLEX']
     backup_positions = ['QB', 'RB', 'WR', 'TE']
+    # Sort keys as plain ints (positions outside the list map to NaN and sort last)
+    category_rank = {pos: i for i, pos in enumerate(category_order)}
+    backup_rank = {pos: i for i, pos in enumerate(backup_positions)}
 
     # 1a. Build IR Disqualified List (Lookup true score if it exists)
     ir_players_list = []
@@ -415,32 +467,27 @@ def format_output_csv(df_optimal, df_remaining, roster_map, ir_players_dict, df_
         df_excluded_single_matchup['Reason'] = 'Single Matchup Filter'
 
     # 2. Calculate Cutoffs 
-    relevant_player_scores_by_team = {} 
-    positional_cutoffs_by_team = {}    
-
-    for roster_id in sorted_roster_ids:
-        team_optimal = df_optimal[df_optimal['Roster_ID'] == roster_id].copy()
-        team_remaining = df_remaining[df_remaining['Roster_ID'] == roster_id].copy()
-
-        relevant_player_data_for_cutoff = team_optimal[['Inherent_Position', 'Median_Points']].copy()
-        
-        for pos in backup_positions: 
-            top_backup = team_remaining[team_remaining['Position'] == pos].head(1)
-            if not top_backup.empty:
-                new_index = len(relevant_player_data_for_cutoff)
-                relevant_player_data_for_cutoff.loc[new_index] = [top_backup.iloc[0]['Position'], top_backup.iloc[0]['Median_Points']] 
-        
-        all_relevant_scores = relevant_player_data_for_cutoff['Median_Points'].tolist()
-        overall_cutoff = min(all_relevant_scores) if all_relevant_scores else -1.0
-        relevant_player_scores_by_team[roster_id] = overall_cutoff
-
-        positional_cutoffs = {}
-        for pos in backup_positions:
-            pos_scores = relevant_player_data_for_cutoff[relevant_player_data_for_cutoff['Inherent_Position'] == pos]['Median_Points'].tolist()
-            if pos_scores:
-                positional_cutoffs[pos] = min(pos_scores)
-            
-        positional_cutoffs_by_team[roster_id] = positional_cutoffs
+    # The players that set a team's cutoffs are its optimal starters plus its top backup at each position
+    # (df_remaining is in points order within each team, so the first row per position is the top backup)
+    top_backups = df_remaining[df_remaining['Position'].isin(backup_positions)].drop_duplicates(['Roster_ID', 'Position'])
+    top_backup_by_team_pos = {
+        (roster_id, pos): (player_name, median_points)
+        for roster_id, pos, player_name, median_points in zip(
+            top_backups['Roster_ID'], top_backups['Position'], top_backups['Player_Name'], top_backups['Median_Points']
+        )
+    }
+    relevant_players = pd.concat([
+        df_optimal[['Roster_ID', 'Inherent_Position', 'Median_Points']],
+        top_backups[['Roster_ID', 'Position', 'Median_Points']].rename(columns={'Position': 'Inherent_Position'}),
+    ], ignore_index=True)
+    relevant_players = relevant_players[relevant_players['Roster_ID'].isin(sorted_roster_ids)]
+
+    # Overall cutoff: the team's lowest relevant score. Positional cutoff: its lowest relevant score at that position.
+    overall_cutoffs = relevant_players.groupby('Roster_ID')['Median_Points'].min()
+    positional_cutoffs = (
+        relevant_players[relevant_players['Inherent_Position'].isin(backup_positions)]
+        .groupby(['Roster_ID', 'Inherent_Position'])['Median_Points'].min()
+    )
 
 
     # --- 3. Combine and Apply Relevance Filter to all disqualified players (IR + SMF) ---
@@ -455,117 +502,109 @@ def format_output_csv(df_optimal, df_remaining, roster_map, ir_players_dict, df_
     else:
         df_disqualified_all['Median Points'] = pd.to_numeric(df_disqualified_all['Median Points'], errors='coerce')
 
-        relevant_disqualified_list = []
-        
-        for index, row in df_disqualified_all.iterrows():
-            roster_id = row['Roster_ID']
-            median_points = row['Median Points']
-            
-            if roster_id not in sorted_roster_ids: continue 
+        roster_ids = df_disqualified_all['Roster_ID']
 
-            overall_cutoff = relevant_player_scores_by_team.get(roster_id, -1.0) 
-            
-            pos = row['Position'] 
-            team_positional_cutoffs = positional_cutoffs_by_team.get(roster_id, {})
-            positional_floor = team_positional_cutoffs.get(pos, overall_cutoff)
-            
-            final_cutoff = max(overall_cutoff, positional_floor)
+        # Look every player's cutoffs up at once: the team's overall cutoff, raised to the
+        # positional floor where the team has one for that position
+        overall_cutoff = roster_ids.map(overall_cutoffs).fillna(-1.0).to_numpy(dtype='float64')
+        positional_floor = positional_cutoffs.reindex(
+            pd.MultiIndex.from_arrays([roster_ids, df_disqualified_all['Position']])
+        ).to_numpy()
+        final_cutoff = np.maximum(overall_cutoff, np.where(np.isnan(positional_floor), overall_cutoff, positional_floor))
 
-            # Apply the competitiveness check 
-            if median_points >= final_cutoff: 
-                relevant_disqualified_list.append(row.to_dict())
-                        
-        df_excluded_filtered = pd.DataFrame(relevant_disqualified_list, columns=df_disqualified_all.columns)
+        # Apply the competitiveness check (only for teams in the report)
+        is_relevant = roster_ids.isin(sorted_roster_ids).to_numpy() & (df_disqualified_all['Median Points'].to_numpy() >= final_cutoff)
+        df_excluded_filtered = df_disqualified_all[is_relevant].reset_index(drop=True)
 
 
     # --- 4. Loop through sorted teams and output ---
-    final_output = []
+    # Order every lineup by slot category and points once, then hand each team its slice
+    df_optimal_sorted = df_optimal.assign(
+        Position_Category=df_optimal['Position'].map(category_rank)
+    ).sort_values(by=['Roster_ID', 'Position_Category', 'Median_Points'], ascending=[True, True, False], kind='stable')
+    df_optimal_sorted = df_optimal_sorted.rename(columns={'Player_Name': 'Player Name', 'Median_Points': 'Median Points'})
+    optimal_by_team = dict(tuple(df_optimal_sorted.groupby('Roster_ID', sort=False)))
+    excluded_by_team = dict(tuple(df_excluded_filtered.groupby('Roster_ID', sort=False)))
+
+    final_output = [] # Plain row dicts; the DataFrame is built once at the end
     for roster_id in sorted_roster_ids:
-        team_df = df_optimal[df_optimal['Roster_ID'] == roster_id].copy()
+        team_df = optimal_by_team.get(roster_id)
         
-        if team_df.empty:
+        if team_df is None:
             continue
             
         team_name = team_df['Team Name'].iloc[0]
 
         # 1. Detail Rows (Optimal Lineup)
-        detail_rows = team_df[['Team Name', 'Position', 'Player_Name', 'Median_Points']].copy()
-        detail_rows.rename(columns={'Player_Name': 'Player Name', 'Median_Points': 'Median Points'}, inplace=True)
-        
-        detail_rows['Position_Category'] = pd.Categorical(detail_rows['Position'], categories=category_order, ordered=True)
-        detail_rows = detail_rows.sort_values(by=['Position_Category', 'Median Points'], ascending=[True, False])
-        detail_rows['Slot_Index'] = detail_rows.groupby('Position_Category', observed=True).cumcount()
-        detail_rows = detail_rows.sort_values(by=['Position_Category', 'Slot_Index']).drop(columns=['Position_Category', 'Slot_Index'])
-        detail_rows = detail_rows[FINAL_COLUMNS] 
-        
-        final_output.append(detail_rows)
+        final_output.extend(team_df[FINAL_COLUMNS].to_dict('records'))
         
         # 2. Summary Row (Total)
-        total_median = team_df['Median_Points'].sum()
-        summary_row = pd.DataFrame([{
+        total_median = team_df['Median Points'].sum()
+        final_output.append({
             'Team Name': team_name,
             'Position': 'TOTAL',
             'Player Name': '',
             'Median Points': total_median
-        }], columns=FINAL_COLUMNS)
-        final_output.append(summary_row)
+        })
 
         # 3. Backup Rows
-        backup_df = df_remaining[df_remaining['Roster_ID'] == roster_id].copy()
-        
-        if not backup_df.empty:
-            for pos in backup_positions:
-                top_backup = backup_df[backup_df['Position'] == pos].head(1)
+        for pos in backup_positions:
+            top_backup = top_backup_by_team_pos.get((roster_id, pos))
+            
+            if top_backup is not None:
+                player_name, median_points = top_backup
                 
-                if not top_backup.empty:
-                    backup_data = top_backup.iloc[0]
-                    
-                    backup_row = pd.DataFrame([{
-                        'Team Name': team_name,
-                        'Position': f'BACKUP {pos}',
-                        'Player Name': backup_data['Player_Name'],
-                        'Median Points': backup_data['Median_Points']
-                    }], columns=FINAL_COLUMNS)
-                    final_output.append(backup_row)
+                final_output.append({
+                    'Team Name': team_name,
+                    'Position': f'BACKUP {pos}',
+                    'Player Name': player_name,
+                    'Median Points': median_points
+                })
             
         # 4. Disqualified Players
-        team_excluded = df_excluded_filtered[df_excluded_filtered['Roster_ID'] == roster_id].copy()
+        team_excluded = excluded_by_team.get(roster_id)
         
-        if not team_excluded.empty:
+        if team_excluded is not None:
             disqualified_list = team_excluded.copy()
-            disqualified_list['Position_Category'] = pd.Categorical(disqualified_list['Position'], categories=backup_positions, ordered=True)
-            disqualified_list['Reason_Category'] = disqualified_list['Reason'].apply(lambda x: 0 if x == 'IR Status' else 1)
+            disqualified_list['Position_Category'] = disqualified_list['Position'].map(backup_rank)
+            disqualified_list['Reason_Category'] = (disqualified_list['Reason'] != 'IR Status').astype(int)
             disqualified_list = disqualified_list.sort_values(by=['Reason_Category', 'Position_Category'], ascending=[True, True])
 
-            for index, player in disqualified_list.iterrows():
-                display_points = player['Median Points']
-
-                disqualified_row = pd.DataFrame([{
+            for reason, player_name, position, display_points in zip(
+                disqualified_list['Reason'], disqualified_list['Player Name'],
+                disqualified_list['Position'], disqualified_list['Median Points']
+            ):
+                final_output.append({
                     'Team Name': team_name,
-                    'Position': f'{player["Reason"].upper()}',
-                    'Player Name': player['Player Name'] + f' ({player["Position"]})', 
+                    'Position': f'{reason.upper()}',
+                    'Player Name': player_name + f' ({position})', 
                     'Median Points': display_points
-                }], columns=FINAL_COLUMNS)
-                final_output.append(disqualified_row)
+                })
             
         # Add an empty row for separation (Team Name is blank)
-        final_output.append(pd.DataFrame([{
+        final_output.append({
             'Team Name': '', 
             'Position': np.nan, 
             'Player Name': np.nan, 
             'Median Points': np.nan
-        }], columns=FINAL_COLUMNS))
+        })
 
 
-    df_final_output = pd.concat(final_output, ignore_index=True)
-    
-    # Output to CSV
-    df_final_output.to_csv(OUTPUT_CSV_FILE, index=False)
+    # Output to CSV, streaming the row dicts straight to the file (missing values become blank cells, as with pandas)
+    with open(OUTPUT_CSV_FILE, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FINAL_COLUMNS, lineterminator=os.linesep)
+        writer.writeheader()
+        writer.writerows(
+            {column: ('' if pd.isna(value) else value) for column, value in row.items()}
+            for row in final_output
+        )
     
     print(f"\n✅ Success! Optimal lineups, backups, and filtered disqualified players saved to {OUTPUT_CSV_FILE}")
     print("The CSV is now sorted by team TOTAL score and includes filtered disqualified players.")
     
     try:
+        # The DataFrame is only needed for the markdown preview
+        df_final_output = pd.DataFrame(final_output, columns=FINAL_COLUMNS)
         if df_final_output.empty:
             return None 
             
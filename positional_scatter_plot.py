@@ -1,13 +1,26 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from matplotlib.ticker import MaxNLocator
 import matplotlib.colors as mcolors
+from sleeper_cache import read_slim_players, slim_file_is_current
+
+try:
+    import orjson as _json
+except ImportError:  # orjson is optional; the standard library parser is slower but equivalent
+    import json as _json
+
+try:
+    import simdjson
+except ImportError:  # pysimdjson is optional; without it the player file is parsed in full
+    simdjson = None
 
 # --- USER-EDITABLE CONFIGURATION ---
 # Player data file from Sleeper API (used for position/name mapping)
 PLAYER_DATA_FILE = 'sleeper_players_20251013_181714.json'
+# Slim Parquet copy written by get_players.py; used instead of the JSON when up to date
+PLAYER_SLIM_FILE = 'players_slim.parquet'
 # Roster data file (used for team name/color mapping)
 ROSTER_NAME_MAP_FILE = 'roster_name_map.json'
 # Folder containing weekly matchup JSONs
@@ -19,27 +32,55 @@ FEATURED_PLAYER_ID = "9488"
 
 # --- PLOTTING CONFIG ---
 TEAM_COLORS = list(mcolors.TABLEAU_COLORS.values()) # 10 distinct colors for league teams
+# Only label points scoring at least this much (None labels every point); each label is a separate
+# matplotlib Text artist, so raising this speeds up crowded charts
+ANNOTATION_MIN_POINTS = None
 
 
 # --- MAP LOADING FUNCTIONS ---
 
-def create_player_maps(file_path):
-    """Loads the Sleeper player data and creates Player ID -> Position and Player ID -> Name maps."""
+def load_position_name_records(file_path):
+    """
+    Returns a (player_id, position, full_name) tuple for every player, or None if the data can't be loaded.
+    Uses PLAYER_SLIM_FILE when it is at least as new as file_path.
+    """
+    if slim_file_is_current(PLAYER_SLIM_FILE, file_path):
+        print(f"Loading player data from {PLAYER_SLIM_FILE} to create player maps...")
+        try:
+            return read_slim_players(PLAYER_SLIM_FILE, ['pid', 'pos', 'name'])
+        except Exception as e:
+            print(f"Could not read {PLAYER_SLIM_FILE} ({e}), falling back to {file_path}.")
+
     print(f"Loading player data from {file_path} to create player maps...")
     try:
-        with open(file_path, 'r') as f:
-            player_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+        with open(file_path, 'rb') as f:
+            raw_player_data = f.read()
+        if simdjson is not None:
+            # Only position and full_name are pulled off the simdjson tape; the rest are never built
+            parser = simdjson.Parser()
+            player_data = parser.parse(raw_player_data)
+        else:
+            player_data = _json.loads(raw_player_data)
+    except (FileNotFoundError, ValueError) as e:
         print(f"\nFATAL ERROR loading player data: {e}")
+        return None
+
+    return [
+        (player_id, details.get('position'), details.get('full_name'))
+        for player_id, details in player_data.items()
+    ]
+
+
+def create_player_maps(file_path):
+    """Loads the Sleeper player data and creates Player ID -> Position and Player ID -> Name maps."""
+    player_records = load_position_name_records(file_path)
+    if player_records is None:
         return None, None
         
     position_map = {}
     name_map = {}
     
-    for player_id, details in player_data.items():
-        position = details.get('position')
-        full_name = details.get('full_name')
-
+    for player_id, position, full_name in player_records:
         if position:
             position_map[player_id] = position
         if full_name:
@@ -53,89 +94,104 @@ def load_roster_map(file_path):
     """Loads the Roster ID -> Owner/Team Name mapping."""
     print(f"Loading roster data from {file_path}...")
     try:
-        with open(file_path, 'r') as f:
-            return {str(k): v for k, v in json.load(f).items()} # Ensure keys are strings
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+        with open(file_path, 'rb') as f:
+            return {str(k): v for k, v in _json.loads(f.read()).items()} # Ensure keys are strings
+    except (FileNotFoundError, _json.JSONDecodeError) as e:
         print(f"\nFATAL ERROR loading roster map: {e}")
         return None
 
 
 # --- Part 1: Data Loading and Benchmark Calculation ---
 
-def get_benchmark_scores(series):
-    """Calculates the points of the 6th and 18th highest-scoring players."""
-    sorted_scores = series.sort_values(ascending=False).reset_index(drop=True)
-    sixth_highest = sorted_scores.get(5, float('nan'))
-    eighteenth_highest = sorted_scores.get(17, float('nan'))
-    return sixth_highest, eighteenth_highest
+def load_week_file(file_path):
+    """Reads and parses a single weekly matchup file."""
+    with open(file_path, 'rb') as f:
+        return _json.loads(f.read())
+
+
+def get_benchmark_scores(df_starters):
+    """
+    Calculates the points of the 6th and 18th highest-scoring players for every (Week, Position).
+    One global sort puts each group's scores in descending order, so the benchmarks are simply
+    the rows ranked 5 and 17 within their group (groups too small to have them are left out).
+    """
+    group_keys = ['Week', 'Position']
+    ranked = df_starters.sort_values(by=group_keys + ['Points'], ascending=[True, True, False])
+    rank_in_group = ranked.groupby(group_keys).cumcount().to_numpy()
+
+    sixth_highest = ranked[rank_in_group == 5].set_index(group_keys)['Points'].rename('6th_Highest_Points')
+    eighteenth_highest = ranked[rank_in_group == 17].set_index(group_keys)['Points'].rename('18th_Highest_Points')
+    return pd.concat([sixth_highest, eighteenth_highest], axis=1).reset_index()
 
 
 def prepare_positional_data(position_map, name_map, roster_map, data_folder=DATA_FOLDER):
     """Processes weekly Sleeper JSONs to extract all starter data."""
     print("\nStarting weekly matchup data processing...")
-    all_starter_data = []
+    # One list per output column, filled in a single walk and handed to pandas once
+    weeks, player_ids, player_names, positions, points_scored, roster_ids, team_names = [], [], [], [], [], [], []
 
     if not os.path.exists(data_folder):
         print(f"FATAL ERROR: Matchup data folder '{data_folder}' was not found.")
         return pd.DataFrame()
 
-    for filename in os.listdir(data_folder):
-        if filename.startswith("matchups_week_") and filename.endswith(".json"):
-            file_path = os.path.join(data_folder, filename)
-            
-            try:
-                week = int(filename.split('_')[2].split('.')[0]) 
-            except (IndexError, ValueError):
-                continue
-                
-            with open(file_path, 'r') as f:
-                week_data = json.load(f)
-            
-            if not isinstance(week_data, list):
-                continue
-
-            for box_score in week_data:
-                roster_id = str(box_score.get('roster_id'))
-                starter_ids = set(box_score.get('starters', []))
-                player_points_map = box_score.get('players_points', {}) 
-
-                if not starter_ids or not player_points_map:
-                    continue 
-
-                for player_id in starter_ids:
-                    points = player_points_map.get(player_id)
-                    position = position_map.get(player_id, 'UNK')
-                    full_name = name_map.get(player_id, 'Unknown Player')
-                    team_name = roster_map.get(roster_id, f"Roster {roster_id}") 
-
-                    if points is not None and position in ['QB', 'RB', 'WR', 'TE', 'K', 'DEF']:
-                        starter_record = {
-                            'Week': week,
-                            'Player_ID': player_id, 
-                            'Player_Name': full_name,
-                            'Position': position, 
-                            'Points': points,
-                            'Roster_ID': roster_id,
-                            'Team_Name': team_name,
-                        }
-                        all_starter_data.append(starter_record)
-
-    if not all_starter_data:
+    with os.scandir(data_folder) as entries:
+        week_entries = [entry for entry in entries if entry.name.startswith("matchups_week_") and entry.name.endswith(".json")]
+
+    week_files = []
+    for entry in week_entries:
+        try:
+            week_files.append((int(entry.name[14:-5]), entry.path)) # The <N> in matchups_week_<N>.json
+        except ValueError:
+            continue
+
+    # Read and parse the weekly files on a thread pool so the disk reads overlap
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        loaded_weeks = list(executor.map(load_week_file, [path for _, path in week_files]))
+
+    for (week, _), week_data in zip(week_files, loaded_weeks):
+        if not isinstance(week_data, list):
+            continue
+
+        for box_score in week_data:
+            roster_id = str(box_score.get('roster_id'))
+            starter_ids = set(box_score.get('starters', []))
+            player_points_map = box_score.get('players_points', {}) 
+
+            if not starter_ids or not player_points_map:
+                continue 
+
+            team_name = roster_map.get(roster_id, f"Roster {roster_id}") 
+
+            for player_id in starter_ids:
+                points = player_points_map.get(player_id)
+                position = position_map.get(player_id, 'UNK')
+
+                if points is not None and position in ['QB', 'RB', 'WR', 'TE', 'K', 'DEF']:
+                    weeks.append(week)
+                    player_ids.append(player_id)
+                    player_names.append(name_map.get(player_id, 'Unknown Player'))
+                    positions.append(position)
+                    points_scored.append(points)
+                    roster_ids.append(roster_id)
+                    team_names.append(team_name)
+
+    if not weeks:
         print("ERROR: No starter data successfully loaded. Check your JSON file contents.")
         return pd.DataFrame()
 
-    df_starters = pd.DataFrame(all_starter_data)
+    df_starters = pd.DataFrame({
+        'Week': weeks,
+        'Player_ID': player_ids,
+        'Player_Name': player_names,
+        'Position': positions,
+        'Points': points_scored,
+        'Roster_ID': roster_ids,
+        'Team_Name': team_names,
+    })
     df_starters['Position'] = df_starters['Position'].replace({'DEF': 'D/ST'})
     
     # --- Calculate Benchmarks ---
-    benchmark_df = (
-        df_starters
-        .groupby(['Week', 'Position'])['Points']
-        .apply(lambda x: pd.Series(get_benchmark_scores(x), 
-                                   index=['6th_Highest_Points', '18th_Highest_Points']))
-        .unstack()
-        .reset_index()
-    )
+    benchmark_df = get_benchmark_scores(df_starters)
 
     # Merge the benchmarks back into the main DataFrame
     df_final = pd.merge(df_starters, benchmark_df, on=['Week', 'Position'], how='left')
@@ -167,6 +223,10 @@ def generate_positional_charts(df_final):
     
     print(f"Generating charts for positions: {', '.join(chart_positions)}")
 
+    # One Figure is drawn, saved and cleared for each position instead of building a new one every time
+    fig, ax = plt.subplots(figsize=(14, 8))
+    SUBPLOT_DEFAULTS = {side: getattr(fig.subplotpars, side) for side in ('left', 'right', 'bottom', 'top')}
+
     for pos in chart_positions:
         pos_df = df_final[df_final['Position'] == pos].copy()
         
@@ -176,7 +236,8 @@ def generate_positional_charts(df_final):
         
         benchmarks = pos_df.drop_duplicates(subset=['Week']).sort_values(by='Week')
         
-        fig, ax = plt.subplots(figsize=(14, 8))
+        ax.clear()
+        fig.subplots_adjust(**SUBPLOT_DEFAULTS) # tight_layout below starts from the last chart's margins otherwise
 
         # --- SCATTER PLOT (Individual Starters, colored by team) ---
         grouped_teams = pos_df.groupby('Roster_ID')
@@ -197,12 +258,14 @@ def generate_positional_charts(df_final):
             )
 
             # Add player name annotations (smaller font size: 6)
-            for i in group.index:
-                player_name_abbr = group['Player_Name'][i].split(' ')[-1]
+            for player_name, week, points in zip(group['Player_Name'], group['Week'], group['Points']):
+                if ANNOTATION_MIN_POINTS is not None and points < ANNOTATION_MIN_POINTS:
+                    continue
+                player_name_abbr = player_name.split(' ')[-1]
                 
                 ax.annotate(
                     player_name_abbr, 
-                    (group['Week'][i], group['Points'][i]), 
+                    (week, points), 
                     textcoords="offset points", 
                     xytext=(5, 5), 
                     ha='left', 
@@ -266,12 +329,14 @@ def generate_positional_charts(df_final):
         ax.legend(title="Fantasy Team", bbox_to_anchor=(1.05, 1), loc='upper left', frameon=True)
         ax.grid(True, axis='y', linestyle=':', alpha=0.6)
         
-        plt.tight_layout(rect=[0, 0, 0.85, 1])
+        fig.tight_layout(rect=[0, 0, 0.85, 1])
         
         # Save the chart
         file_name = f'{pos}_Weekly_Score_Comparison_Annotated.png'
-        plt.savefig(os.path.join(plot_dir, file_name))
-        plt.close(fig)
+        # zlib level 1 instead of PIL's default 6: much quicker to encode, for somewhat larger files
+        fig.savefig(os.path.join(plot_dir, file_name), pil_kwargs={'compress_level': 1})
+
+    plt.close(fig)
 
     print(f"\n✅ Success! All positional charts have been saved to the '{plot_dir}' folder.")
 
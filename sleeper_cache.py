@@ -0,0 +1,101 @@
+import functools
+import json
+import os
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the (slower) standard library
+    orjson = None
+
+# --- Shared by get_players.py, get_matchups.py and get_roster_map.py ---
+# Remembers the ETag of each downloaded payload so unchanged data isn't fetched again
+ETAG_CACHE_FILE = ".sleeper_cache.json"
+
+# Flat copy of every week, saved by get_matchups.py inside the matchup data folder (needs pyarrow)
+MATCHUPS_TABLE_FILE = "matchups.parquet"
+
+def save_json(data, file_path, pretty=False):
+    """Writes data to file_path as compact JSON (indented if pretty), using orjson when it is installed."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        payload = orjson.dumps(data, option=option)
+    elif pretty:
+        payload = json.dumps(data, indent=2).encode('utf-8')
+    else:
+        payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    with open(file_path, 'wb') as f:
+        f.write(payload)
+
+def load_json(raw):
+    """Parses JSON from bytes, using orjson when it is installed."""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def load_etag_cache():
+    """Loads the {url: etag} map saved by earlier runs (empty if there isn't one yet)."""
+    try:
+        with open(ETAG_CACHE_FILE, 'rb') as f:
+            raw = f.read()
+        return load_json(raw)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def etag_headers(etag_cache, url, local_path):
+    """Returns an If-None-Match header for url, as long as the earlier download is still on disk."""
+    etag = etag_cache.get(url)
+    return {'If-None-Match': etag} if etag and os.path.exists(local_path) else {}
+
+def slim_file_is_current(slim_path, json_path):
+    """True if the slim Parquet file written by get_players.py exists and is at least as new as json_path."""
+    return os.path.exists(slim_path) and (
+        not os.path.exists(json_path)
+        or os.path.getmtime(slim_path) >= os.path.getmtime(json_path)
+    )
+
+def read_slim_players(slim_path, columns):
+    """Reads the given columns of the slim player file and returns one tuple per player, in column order."""
+    df_slim = pd.read_parquet(slim_path, columns=columns)
+    return list(zip(*(df_slim[column] for column in columns)))
+
+def parse_week_num(file_name):
+    """Returns the <N> in matchups_week_<N>.json, or None for any other file name."""
+    if not (file_name.startswith('matchups_week_') and file_name.endswith('.json')):
+        return None
+    try:
+        return int(file_name[14:-5])
+    except ValueError:
+        return None
+
+@functools.lru_cache(maxsize=4)
+def read_matchups_table(file_path, mtime_ns):
+    """
+    Reads the flat (week, roster_id, player_id, points, is_starter) matchup table.
+    Memoized on (file_path, mtime_ns), so a table rewritten on disk is read again.
+    """
+    return pd.read_parquet(file_path, columns=['week', 'roster_id', 'player_id', 'points', 'is_starter'])
+
+def load_matchups_table(data_folder, week_files):
+    """
+    Returns a copy of the matchup table saved in data_folder, or None if it is missing, unreadable or stale.
+    week_files lists (path, mtime_ns) for every weekly file the caller would otherwise read. The table is
+    only current if it is at least as new as all of them and holds exactly their weeks, so a week added
+    or deleted since it was written (or a file that isn't a numbered week) means the JSONs must be read.
+    """
+    table_path = os.path.join(data_folder, MATCHUPS_TABLE_FILE)
+    if not week_files or not os.path.exists(table_path):
+        return None
+    table_mtime_ns = os.stat(table_path).st_mtime_ns
+    if table_mtime_ns < max(mtime_ns for _, mtime_ns in week_files):
+        return None
+    file_weeks = {parse_week_num(os.path.basename(path)) for path, _ in week_files}
+    if None in file_weeks:
+        return None
+
+    try:
+        df_matchups = read_matchups_table(table_path, table_mtime_ns)
+    except Exception as e:
+        print(f"Warning: Could not read {table_path} ({e}). Falling back to the weekly JSON files.")
+        return None
+    if set(df_matchups['week'].unique().tolist()) != file_weeks:
+        return None
+    return df_matchups.copy() # The cached frame itself is never handed out